@@ -6,19 +6,17 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from jose import JWTError, jwt
-from pymongo import MongoClient
 from dotenv import load_dotenv
 
+from .db import db
+
 load_dotenv()
 
-MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "super-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 # MongoDB setup
-client = MongoClient(MONGODB_URI)
-db = client["crimewatch"]
 USER_COLLECTION = db["users"]
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -0,0 +1,16 @@
+# backend/db.py
+
+import os
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+# =====================================================
+# DATABASE
+# =====================================================
+# One client, and so one connection pool, per process. Importing this module
+# loads no models, so maintenance CLIs like backend.rollups can use it too.
+load_dotenv()
+MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+
+client = MongoClient(MONGODB_URI)
+db = client["crimewatch"]
@@ -0,0 +1,55 @@
+# backend/inference.py
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+from torchvision import transforms
+
+# =====================================================
+# PREPROCESSING
+# =====================================================
+# Pure functions with no import-time side effects (no model load, no database),
+# so benchmarks/bench.py can time exactly the code the endpoints run.
+transform = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.ToTensor(),
+    transforms.Normalize([0.485, 0.456, 0.406],
+                         [0.229, 0.224, 0.225])
+])
+
+def pil_from_bgr(bgr):
+    rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+    return Image.fromarray(rgb)
+
+def decode_image(content: bytes):
+    """Decodes uploaded JPEG/PNG bytes to a BGR frame, or None if invalid"""
+    nparr = np.frombuffer(content, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+def build_clip(frames, device):
+    """BGR frames -> (1, T, C, H, W) tensor for CNN_LSTM"""
+    tensors = [transform(pil_from_bgr(f)) for f in frames]
+    return torch.stack(tensors).unsqueeze(0).to(device)
+
+# =====================================================
+# MODEL CALLS
+# =====================================================
+def violence_from_clip(model, clip):
+    with torch.no_grad():
+        out = model(clip)
+        prob = float(out.squeeze().cpu().item())
+    label = "Violence" if prob >= 0.5 else "Non-Violence"
+    return label, prob
+
+def detect_weapons(model, frame, conf_threshold=0.5):
+    """Class-0 (weapon) boxes as [x1, y1, x2, y2] ints"""
+    results = model.predict(frame, conf=conf_threshold, verbose=False)
+    boxes = results[0].boxes
+    weapon_boxes = []
+    if boxes is not None and len(boxes) > 0:
+        for box, cls in zip(boxes.xyxy, boxes.cls):
+            if int(cls) == 0:
+                x1, y1, x2, y2 = map(int, box.tolist())
+                weapon_boxes.append([x1, y1, x2, y2])
+    return weapon_boxes
@@ -0,0 +1,277 @@
+# backend/jobs.py
+
+import os
+import uuid
+import hashlib
+import datetime
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from pymongo.errors import DuplicateKeyError
+
+from .db import db
+from .main import SEQ_LEN, detect_weapons_in_frame, predict_violence_from_buffer, span
+
+# =====================================================
+# CONFIG
+# =====================================================
+# Uploads only live here while their job is queued/running; results are kept in MongoDB
+VIDEO_DIR = os.path.join("backend", "video_uploads")
+os.makedirs(VIDEO_DIR, exist_ok=True)
+
+VIDEO_JOB_WORKERS = int(os.getenv("VIDEO_JOB_WORKERS", "1"))
+VIDEO_JOB_MAX_PENDING = int(os.getenv("VIDEO_JOB_MAX_PENDING", "8"))
+VIDEO_SAMPLE_EVERY = int(os.getenv("VIDEO_SAMPLE_EVERY", "5"))  # analyze every Nth frame
+VIDEO_MAX_BYTES = int(os.getenv("VIDEO_MAX_BYTES", str(2 * 1024 ** 3)))  # 2 GB
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+PROGRESS_UPDATE_EVERY = 100   # frames between progress writes
+MAX_STORED_DETECTIONS = 1000  # keeps result documents well under the 16 MB limit
+
+# =====================================================
+# DATABASE
+# =====================================================
+# Jobs are keyed by the SHA-256 of the uploaded file, so re-uploading the
+# same video returns the existing job instead of analyzing it again
+jobs_collection = db["video_jobs"]
+jobs_collection.create_index("job_id", unique=True)
+
+# =====================================================
+# WORKER POOL
+# =====================================================
+# Workers share the models loaded in backend.main; the semaphore bounds
+# queued + running jobs so uploads are refused instead of piling up
+executor = ThreadPoolExecutor(max_workers=VIDEO_JOB_WORKERS, thread_name_prefix="video-job")
+pending_slots = threading.BoundedSemaphore(VIDEO_JOB_MAX_PENDING)
+# Checked between frames: concurrent.futures joins running workers at exit,
+# so shutdown would otherwise wait for the current video to finish
+stop_event = threading.Event()
+
+class JobInterrupted(Exception):
+    pass
+
+def now_str():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def update_job(job_id: str, **fields):
+    jobs_collection.update_one({"job_id": job_id}, {"$set": fields})
+
+def analyze_video(job_id: str, path: str):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError("Could not open video file.")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    update_job(job_id, status="running", started_at=now_str(), total_frames=total_frames)
+
+    # Windows of SEQ_LEN sampled frames, advancing by half a window
+    window = deque(maxlen=SEQ_LEN)
+    stride = max(1, SEQ_LEN // 2)
+    since_last_window = 0
+
+    detections = []
+    windows = []
+    weapon_frames = 0
+    frame_idx = 0
+
+    try:
+        while True:
+            if stop_event.is_set():
+                raise JobInterrupted("Interrupted by server shutdown.")
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            if frame_idx % VIDEO_SAMPLE_EVERY == 0:
+                boxes = detect_weapons_in_frame(frame)
+                if boxes:
+                    weapon_frames += 1
+                    if len(detections) < MAX_STORED_DETECTIONS:
+                        detections.append({"frame": frame_idx, "time": round(frame_idx / fps, 2),
+                                           "boxes": boxes})
+
+                window.append(frame)
+                since_last_window += 1
+                if len(window) == SEQ_LEN and since_last_window >= stride:
+                    since_last_window = 0
+                    label, prob = predict_violence_from_buffer(window)
+                    start = frame_idx - (SEQ_LEN - 1) * VIDEO_SAMPLE_EVERY
+                    windows.append({"start_time": round(start / fps, 2),
+                                    "end_time": round(frame_idx / fps, 2),
+                                    "label": label, "prob": prob})
+
+            frame_idx += 1
+            if frame_idx % PROGRESS_UPDATE_EVERY == 0:
+                progress = min(frame_idx / total_frames, 1.0) if total_frames > 0 else None
+                update_job(job_id, frames_processed=frame_idx, progress=progress)
+    finally:
+        cap.release()
+
+    max_prob = max((w["prob"] for w in windows), default=0.0)
+    return {
+        "frames": frame_idx,
+        "fps": fps,
+        "violence_detected": any(w["label"] == "Violence" for w in windows),
+        "max_violence_prob": max_prob,
+        "weapon_detected": weapon_frames > 0,
+        "weapon_frames": weapon_frames,
+        "detections": detections,
+        "windows": windows,
+    }
+
+def remove_upload(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def run_job(job_id: str, path: str):
+    try:
+        with span("video_job", job_id=job_id):
+            result = analyze_video(job_id, path)
+        update_job(job_id, status="done", progress=1.0, frames_processed=result["frames"],
+                   finished_at=now_str(), result=result)
+        print(f"🎞️ Video job {job_id[:12]} done")
+    except JobInterrupted as e:
+        print(f"Video job {job_id[:12]} interrupted")
+        update_job(job_id, status="failed", finished_at=now_str(), error=str(e))
+    except Exception as e:
+        print(f"Video job {job_id[:12]} error:", e)
+        update_job(job_id, status="failed", finished_at=now_str(), error=str(e))
+    finally:
+        # Only the result is kept; a failed job is retried by uploading again
+        remove_upload(path)
+        pending_slots.release()
+
+def job_summary(doc, deduplicated=False):
+    return {
+        "job_id": doc["job_id"],
+        "filename": doc.get("filename"),
+        "status": doc["status"],
+        "progress": doc.get("progress"),
+        "frames_processed": doc.get("frames_processed", 0),
+        "total_frames": doc.get("total_frames"),
+        "created_at": doc.get("created_at"),
+        "finished_at": doc.get("finished_at"),
+        "error": doc.get("error"),
+        "deduplicated": deduplicated,
+    }
+
+def fail_interrupted_jobs():
+    """Jobs that were queued/running when the server stopped can be retried by re-uploading"""
+    jobs_collection.update_many(
+        {"status": {"$in": ["queued", "running"]}},
+        {"$set": {"status": "failed", "error": "Interrupted by server restart.", "finished_at": now_str()}},
+    )
+    # Their videos, and .part files of uploads cut off by the restart
+    for name in os.listdir(VIDEO_DIR):
+        remove_upload(os.path.join(VIDEO_DIR, name))
+
+def stop_video_jobs():
+    """Cancels queued jobs and stops the running ones at their next frame"""
+    stop_event.set()
+    executor.shutdown(wait=True, cancel_futures=True)
+
+def write_block(out, digest, block):
+    digest.update(block)
+    out.write(block)
+
+def queue_upload(tmp_path: str, job_id: str, size: int, filename: str, ext: str):
+    if size == 0:
+        remove_upload(tmp_path)
+        return {"error": "Empty upload."}
+
+    if not pending_slots.acquire(blocking=False):
+        remove_upload(tmp_path)
+        return {"error": "Too many queued video jobs, try again later."}
+
+    job = {
+        "job_id": job_id,
+        "filename": filename,
+        "size": size,
+        "status": "queued",
+        "progress": 0.0,
+        "frames_processed": 0,
+        "created_at": now_str(),
+    }
+    try:
+        jobs_collection.insert_one(job)
+    except DuplicateKeyError:
+        # Same content seen before: reuse it unless the earlier run failed
+        claimed = jobs_collection.update_one(
+            {"job_id": job_id, "status": "failed"},
+            {"$set": job, "$unset": {"error": "", "result": "", "finished_at": ""}},
+        ).modified_count == 1
+        if not claimed:
+            pending_slots.release()
+            remove_upload(tmp_path)
+            return job_summary(jobs_collection.find_one({"job_id": job_id}), deduplicated=True)
+
+    # Named per upload, so a retried job never shares a file with the run it replaces
+    video_path = os.path.splitext(tmp_path)[0] + ext
+    os.replace(tmp_path, video_path)
+    executor.submit(run_job, job_id, video_path)
+    return job_summary(job)
+
+# =====================================================
+# ENDPOINT FUNCTIONS
+# =====================================================
+# The video is the raw request body, not a multipart form: FastAPI would spool a
+# whole form to a temp file before the handler runs, so the size limit and
+# disconnect cleanup could not act on the incoming stream.
+#   curl --data-binary @clip.mp4 "http://localhost:8000/videos/?filename=clip.mp4"
+async def upload_video(request: Request, filename: str = "upload.mp4"):
+    """Stream a video to disk and queue it for background analysis"""
+    too_large = {"error": f"Video exceeds the {VIDEO_MAX_BYTES // 1024 ** 2} MB upload limit."}
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > VIDEO_MAX_BYTES:
+        return too_large
+
+    ext = os.path.splitext(filename)[1].lower()
+    if not ext[1:].isalnum():
+        ext = ".mp4"
+    tmp_path = os.path.join(VIDEO_DIR, f"upload_{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    # File writes and hashing run in the threadpool, one UPLOAD_CHUNK_SIZE block at a time
+    out = await run_in_threadpool(open, tmp_path, "wb")
+    try:
+        pending = bytearray()
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > VIDEO_MAX_BYTES:
+                break
+            pending += chunk
+            if len(pending) >= UPLOAD_CHUNK_SIZE:
+                await run_in_threadpool(write_block, out, digest, pending)
+                pending.clear()
+        if size <= VIDEO_MAX_BYTES:
+            await run_in_threadpool(write_block, out, digest, pending)
+    except BaseException:
+        # Client disconnects and disk errors must not leave .part files behind
+        out.close()
+        remove_upload(tmp_path)
+        raise
+    out.close()
+
+    if size > VIDEO_MAX_BYTES:
+        remove_upload(tmp_path)
+        return too_large
+    return await run_in_threadpool(queue_upload, tmp_path, digest.hexdigest(), size, filename, ext)
+
+def get_video_job(job_id: str):
+    doc = jobs_collection.find_one({"job_id": job_id}, {"result": 0})
+    if not doc:
+        return {"error": "Job not found."}
+    return job_summary(doc)
+
+def get_video_result(job_id: str):
+    doc = jobs_collection.find_one({"job_id": job_id})
+    if not doc:
+        return {"error": "Job not found."}
+    if doc["status"] != "done":
+        return {"error": f"Job is {doc['status']}.", "status": doc["status"]}
+    return {"job_id": job_id, "filename": doc.get("filename"), "result": doc["result"]}
@@ -2,21 +2,24 @@
 
 import os
 import datetime
+import threading
 import torch
-import numpy as np
 import cv2
 from collections import defaultdict, deque
-from PIL import Image
-from torchvision import transforms
 from fastapi import UploadFile, File, Form
 from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail, Attachment, FileContent, FileName, FileType, Disposition
-from pymongo import MongoClient
 from dotenv import load_dotenv
 from ultralytics import YOLO
 
+from .db import db
 from .models import CNN_LSTM
+from .inference import decode_image, build_clip, violence_from_clip, detect_weapons
+from .rollups import record_alert
+from mod import span_tracer
+from mod.span_tracer import span
 
 # =====================================================
 # CONFIG
@@ -25,7 +28,6 @@ load_dotenv()
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
 ALERT_EMAIL = os.getenv("ALERT_EMAIL")
 SENDER_EMAIL = os.getenv("SENDER_EMAIL")
-MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
 
 MODEL_WEAPON_PATH = "backend\\best.pt"
 MODEL_VIOLENCE_PATH = "backend\\cnn_lstm.pth"
@@ -34,23 +36,26 @@ os.makedirs(TEMP_DIR, exist_ok=True)
 
 SEQ_LEN = int(os.getenv("SEQ_LEN", "16"))
 
+# Set PROFILE_TRACE to a .json path to record per-request spans (written on shutdown);
+# PROFILE_TORCH=1 also runs torch.profiler for the first PROFILE_TORCH_STEPS analyzed
+# frames, written to <PROFILE_TRACE stem>.torch.json as soon as that window ends
+PROFILE_TRACE = os.getenv("PROFILE_TRACE")
+PROFILE_TORCH = os.getenv("PROFILE_TORCH", "0") == "1"
+PROFILE_TORCH_STEPS = int(os.getenv("PROFILE_TORCH_STEPS", "100"))
+PROFILE_MAX_EVENTS = 200_000
+if PROFILE_TRACE:
+    span_tracer.enable(PROFILE_TRACE, torch_profiler=PROFILE_TORCH,
+                       torch_steps=PROFILE_TORCH_STEPS, max_events=PROFILE_MAX_EVENTS)
+
 # =====================================================
 # DATABASE
 # =====================================================
-client = MongoClient(MONGODB_URI)
-db = client["crimewatch"]
 alerts_collection = db["alerts"]
 
 # =====================================================
 # MODELS
 # =====================================================
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize([0.485, 0.456, 0.406],
-                         [0.229, 0.224, 0.225])
-])
 
 print("🔁 Loading models...")
 weapon_model = YOLO(MODEL_WEAPON_PATH)
@@ -67,35 +72,23 @@ print("✅ Models loaded successfully.")
 # HELPERS
 # =====================================================
 frame_buffers = defaultdict(lambda: deque(maxlen=SEQ_LEN))
-
-def pil_from_bgr(bgr):
-    rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
-    return Image.fromarray(rgb)
+# Models are shared by request handlers and ingestion workers
+inference_lock = threading.Lock()
 
 def predict_violence_from_buffer(buffer_deque):
     try:
-        tensors = [transform(pil_from_bgr(f)) for f in list(buffer_deque)]
-        clip = torch.stack(tensors).unsqueeze(0).to(device)
-        with torch.no_grad():
-            out = violence_model(clip)
-            prob = float(out.squeeze().cpu().item())
-        label = "Violence" if prob >= 0.5 else "Non-Violence"
-        return label, prob
+        with span("preprocess"):
+            clip = build_clip(list(buffer_deque), device)
+        with inference_lock, span("cnn_lstm"):
+            return violence_from_clip(violence_model, clip)
     except Exception as e:
         print("Violence prediction error:", e)
         return "Error", 0.0
 
 def detect_weapons_in_frame(frame, conf_threshold=0.5):
     try:
-        results = weapon_model.predict(frame, conf=conf_threshold, verbose=False)
-        boxes = results[0].boxes
-        weapon_boxes = []
-        if boxes is not None and len(boxes) > 0:
-            for box, cls in zip(boxes.xyxy, boxes.cls):
-                if int(cls) == 0:
-                    x1, y1, x2, y2 = map(int, box.tolist())
-                    weapon_boxes.append([x1, y1, x2, y2])
-        return weapon_boxes
+        with inference_lock, span("yolo"):
+            return detect_weapons(weapon_model, frame, conf_threshold)
     except Exception as e:
         print("YOLO error:", e)
         return []
@@ -135,14 +128,15 @@ def send_email_alert(location: str, dt: str, file_path: str, danger_label: str):
 # =====================================================
 # ENDPOINT FUNCTIONS
 # =====================================================
-async def upload_frame(frame: UploadFile = File(...), camera_id: str = Form("camera_01")):
-    """Upload a single frame for analysis"""
-    content = await frame.read()
-    nparr = np.frombuffer(content, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    if img is None:
-        return {"error": "Invalid image data."}
+def analyze_frame(img, camera_id: str):
+    """Run detection on a BGR frame, store the alert and return the danger label"""
+    try:
+        with span("analyze_frame", camera_id=camera_id):
+            return _analyze_frame(img, camera_id)
+    finally:
+        span_tracer.tracer.step()
 
+def _analyze_frame(img, camera_id: str):
     dt = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     location = camera_id
 
@@ -163,10 +157,12 @@ async def upload_frame(frame: UploadFile = File(...), camera_id: str = Form("cam
     if danger:
         basename = f"alert_{camera_id}_{int(datetime.datetime.now().timestamp())}.png"
         snapshot_path = os.path.join(TEMP_DIR, basename)
-        cv2.imwrite(snapshot_path, img)
-        email_status = send_email_alert(location, dt, snapshot_path, danger_label)
+        with span("snapshot"):
+            cv2.imwrite(snapshot_path, img)
+        with span("email"):
+            email_status = send_email_alert(location, dt, snapshot_path, danger_label)
 
-    alerts_collection.insert_one({
+    alert = {
         "timestamp": dt,
         "camera_id": camera_id,
         "danger_status": danger_label,
@@ -175,8 +171,23 @@ async def upload_frame(frame: UploadFile = File(...), camera_id: str = Form("cam
         "weapon_detected": weapon_detected,
         "snapshot_path": snapshot_path,
         "email_status": email_status,
-    })
+    }
+    with span("db_insert"):
+        alerts_collection.insert_one(alert)
+        record_alert(alert)
+    return danger_label
 
+async def upload_frame(frame: UploadFile = File(...), camera_id: str = Form("camera_01")):
+    """Upload a single frame for analysis"""
+    content = await frame.read()
+    with span("jpeg_decode"):
+        img = decode_image(content)
+    if img is None:
+        return {"error": "Invalid image data."}
+
+    # analyze_frame blocks on inference_lock while ingestion/job workers infer;
+    # run it off the event loop so other endpoints stay responsive
+    danger_label = await run_in_threadpool(analyze_frame, img, camera_id)
     return {"message": "Frame processed", "status": danger_label}
 
 def get_alerts(limit: int = 20):
@@ -187,6 +198,12 @@ def get_alerts(limit: int = 20):
     )
     return {"alerts": docs}
 
+def write_profile():
+    if PROFILE_TRACE:
+        span_tracer.tracer.write(PROFILE_TRACE)
+        print(f"⏱️ Trace saved to {PROFILE_TRACE}")
+        print(span_tracer.tracer.summary())
+
 def get_snapshot(filename: str):
     path = os.path.join(TEMP_DIR, filename)
     if not os.path.exists(path):
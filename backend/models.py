@@ -3,9 +3,9 @@ import torch.nn as nn
 import torchvision.models as models
 
 class CNN_LSTM(nn.Module):
-    def __init__(self, embed_dim=512, hidden_dim=256, num_layers=1):
+    def __init__(self, embed_dim=512, hidden_dim=256, num_layers=1, pretrained=True):
         super(CNN_LSTM, self).__init__()
-        base_model = models.resnet18(pretrained=True)
+        base_model = models.resnet18(pretrained=pretrained)
         self.cnn = nn.Sequential(*list(base_model.children())[:-1])
         self.cnn_fc = nn.Linear(base_model.fc.in_features, embed_dim)
         self.lstm = nn.LSTM(embed_dim, hidden_dim, num_layers, batch_first=True)
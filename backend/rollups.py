@@ -0,0 +1,197 @@
+# backend/rollups.py
+
+import uuid
+import argparse
+import datetime
+from collections import defaultdict
+from pymongo import UpdateOne, ASCENDING
+
+from .db import db
+
+# =====================================================
+# CONFIG
+# =====================================================
+# Alert timestamps are "%Y-%m-%d %H:%M:%S" strings, so a bucket key is a prefix
+GRANULARITIES = {"hour": 13, "day": 10}     # "2025-01-31 14", "2025-01-31"
+DEFAULT_RANGE = {"hour": datetime.timedelta(hours=24), "day": datetime.timedelta(days=30)}
+ALL_CAMERAS = "__all__"
+BACKFILL_BATCH = 1000
+COUNTS = ("total", "danger", "violence", "weapon", "violence_and_weapon")
+
+# =====================================================
+# DATABASE
+# =====================================================
+# Each alert is folded into the rollups exactly once: whoever sets its
+# `rolled_up` field first (record_alert with "live", or a backfill run with its
+# own token) applies the increments
+alerts_collection = db["alerts"]
+rollups_collection = db["alert_rollups"]
+rollups_collection.create_index(
+    [("granularity", ASCENDING), ("camera_id", ASCENDING), ("bucket", ASCENDING)], unique=True)
+
+# =====================================================
+# HELPERS
+# =====================================================
+def alert_counts(alert: dict):
+    violence = alert.get("violence_label") == "Violence"
+    weapon = bool(alert.get("weapon_detected"))
+    return {
+        "total": 1,
+        "danger": int(violence or weapon),
+        "violence": int(violence),
+        "weapon": int(weapon),
+        "violence_and_weapon": int(violence and weapon),
+    }
+
+def bucket_keys(alert: dict):
+    """(granularity, camera_id, bucket) keys one alert contributes to"""
+    ts = alert["timestamp"]
+    for granularity, prefix in GRANULARITIES.items():
+        for camera_id in (alert["camera_id"], ALL_CAMERAS):
+            yield granularity, camera_id, ts[:prefix]
+
+def rollup_ops(alert: dict):
+    """Upserts that fold one alert into its hour/day buckets, per camera and overall"""
+    inc = alert_counts(alert)
+    prob = float(alert.get("violence_prob") or 0.0)
+    ts = alert["timestamp"]
+    return [
+        UpdateOne(
+            {"granularity": granularity, "camera_id": camera_id, "bucket": bucket},
+            {"$inc": inc, "$max": {"max_violence_prob": prob, "last_alert": ts}},
+            upsert=True,
+        )
+        for granularity, camera_id, bucket in bucket_keys(alert)
+    ]
+
+def record_alert(alert: dict):
+    """Call after an alert is inserted; never lets a rollup error break the alert path"""
+    try:
+        claimed = alerts_collection.update_one(
+            {"_id": alert["_id"], "rolled_up": {"$exists": False}},
+            {"$set": {"rolled_up": "live"}},
+        ).modified_count == 1
+        if claimed:
+            try:
+                rollups_collection.bulk_write(rollup_ops(alert), ordered=False)
+            except Exception:
+                # Leave the alert for the next backfill run
+                alerts_collection.update_one({"_id": alert["_id"]}, {"$unset": {"rolled_up": ""}})
+                raise
+    except Exception as e:
+        print("Rollup error:", e)
+
+def backfill():
+    """
+    Folds every alert that is not yet counted into the rollups: alerts from before
+    rollups existed, and alerts whose live record_alert failed. Today's alerts are
+    included.
+
+    Alerts are claimed in batches before being counted, and the live path claims
+    alerts the same way, so a run can overlap live traffic without counting any
+    alert twice. Stats are only ever incremented, never reset. Runs are
+    idempotent: run once after deploying rollups, then on a schedule (e.g. hourly)
+    to pick up alerts whose live update failed.
+    """
+    token = uuid.uuid4().hex
+    count = 0
+    query = {"rolled_up": {"$exists": False}, "timestamp": {"$type": "string"},
+             "camera_id": {"$type": "string"}}
+    while True:
+        # Walk forward by _id so each batch resumes where the last one stopped
+        ids = [doc["_id"] for doc in alerts_collection.find(query, {"_id": 1})
+               .sort("_id", 1).limit(BACKFILL_BATCH)]
+        if not ids:
+            return count
+        query["_id"] = {"$gt": ids[-1]}
+        alerts_collection.update_many({"_id": {"$in": ids}, "rolled_up": {"$exists": False}},
+                                      {"$set": {"rolled_up": token}})
+        claimed = alerts_collection.find(
+            {"_id": {"$in": ids}, "rolled_up": token},
+            {"timestamp": 1, "camera_id": 1, "violence_label": 1, "violence_prob": 1,
+             "weapon_detected": 1},
+        )
+
+        # One $inc/$max per bucket per batch instead of one per alert
+        buckets = defaultdict(lambda: {"inc": dict.fromkeys(COUNTS, 0), "prob": 0.0, "last": ""})
+        claimed_ids = []
+        for alert in claimed:
+            claimed_ids.append(alert["_id"])
+            counts = alert_counts(alert)
+            prob = float(alert.get("violence_prob") or 0.0)
+            for key in bucket_keys(alert):
+                bucket = buckets[key]
+                for field, value in counts.items():
+                    bucket["inc"][field] += value
+                bucket["prob"] = max(bucket["prob"], prob)
+                bucket["last"] = max(bucket["last"], alert["timestamp"])
+
+        ops = [
+            UpdateOne(
+                {"granularity": granularity, "camera_id": camera_id, "bucket": bucket_key},
+                {"$inc": bucket["inc"],
+                 "$max": {"max_violence_prob": bucket["prob"], "last_alert": bucket["last"]}},
+                upsert=True,
+            )
+            for (granularity, camera_id, bucket_key), bucket in buckets.items()
+        ]
+        if ops:
+            try:
+                rollups_collection.bulk_write(ops, ordered=False)
+            except Exception:
+                alerts_collection.update_many({"_id": {"$in": claimed_ids}, "rolled_up": token},
+                                              {"$unset": {"rolled_up": ""}})
+                raise
+        count += len(claimed_ids)
+
+# =====================================================
+# ENDPOINT FUNCTIONS
+# =====================================================
+def get_alert_stats(start: str = None, end: str = None, camera_id: str = None, granularity: str = "hour"):
+    """Alert counts per bucket between start and end ("YYYY-MM-DD[ HH[:MM:SS]]")"""
+    if granularity not in GRANULARITIES:
+        return {"error": f"granularity must be one of {list(GRANULARITIES)}."}
+    prefix = GRANULARITIES[granularity]
+
+    now = datetime.datetime.now()
+    end = end or now.strftime("%Y-%m-%d %H:%M:%S")
+    start = start or (now - DEFAULT_RANGE[granularity]).strftime("%Y-%m-%d %H:%M:%S")
+
+    docs = list(
+        rollups_collection.find(
+            {"granularity": granularity, "camera_id": camera_id or ALL_CAMERAS,
+             "bucket": {"$gte": start[:prefix], "$lte": end[:prefix]}},
+            {"_id": 0, "granularity": 0, "camera_id": 0},
+        ).sort("bucket", 1)
+    )
+
+    totals = {"total": 0, "danger": 0, "violence": 0, "weapon": 0, "violence_and_weapon": 0}
+    max_prob = 0.0
+    for doc in docs:
+        for key in totals:
+            totals[key] += doc.get(key, 0)
+        max_prob = max(max_prob, doc.get("max_violence_prob", 0.0))
+
+    return {
+        "camera_id": camera_id or "all",
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "totals": {**totals, "max_violence_prob": max_prob},
+        "buckets": docs,
+    }
+
+# =====================================================
+# MAIN
+# =====================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Alert rollup maintenance")
+    parser.add_argument("--backfill", action="store_true",
+                        help="Count alerts not yet in the rollups (safe to re-run or schedule)")
+    args = parser.parse_args()
+
+    if args.backfill:
+        print("🔁 Rolling up uncounted alerts...")
+        print(f"✅ Rolled up {backfill()} alert(s).")
+    else:
+        parser.print_help()
@@ -2,7 +2,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from backend.auth_router import router as auth_router
-from backend.main import upload_frame, get_alerts, get_snapshot
+from backend.main import upload_frame, get_alerts, get_snapshot, write_profile
+from backend.ingest import add_stream, list_streams, remove_stream, start_ingestion, stop_ingestion
+from backend.rollups import get_alert_stats
+from backend.jobs import upload_video, get_video_job, get_video_result, fail_interrupted_jobs, stop_video_jobs
 
 # =====================================================
 # APP INITIALIZATION
@@ -29,7 +32,23 @@ app.add_middleware(
 app.include_router(auth_router)          # Authentication (Signup, Signin, Verify)
 app.post("/upload-frame/")(upload_frame) # Frame Upload API
 app.get("/alerts/")(get_alerts)          # Alerts fetch API
+app.get("/alerts/stats")(get_alert_stats)  # Pre-aggregated alert stats
 app.get("/snapshot/{filename}")(get_snapshot)  # Snapshot API
+app.post("/streams/")(add_stream)        # Start pulling a camera stream
+app.get("/streams/")(list_streams)       # Camera stream status
+app.delete("/streams/{camera_id}")(remove_stream)  # Stop a camera stream
+app.post("/videos/")(upload_video)       # Upload a video for background analysis
+app.get("/videos/{job_id}")(get_video_job)  # Video job status/progress
+app.get("/videos/{job_id}/result")(get_video_result)  # Video job result
+
+# =====================================================
+# LIFECYCLE
+# =====================================================
+app.on_event("startup")(start_ingestion)   # Decoders for CAMERA_SOURCES + workers
+app.on_event("startup")(fail_interrupted_jobs)  # Jobs cut off by a restart can be re-uploaded
+app.on_event("shutdown")(stop_ingestion)
+app.on_event("shutdown")(stop_video_jobs)
+app.on_event("shutdown")(write_profile)    # Chrome trace when PROFILE_TRACE is set
 
 # =====================================================
 # MAIN
@@ -0,0 +1,283 @@
+# benchmarks/bench.py
+"""
+Micro-benchmarks for the CrimeWatch models and preprocessing.
+
+Everything runs offline: inputs are synthetic and model weights are randomly
+initialized, so numbers measure compute cost, not accuracy.
+
+    python -m benchmarks.bench run --output benchmarks/baselines/cpu.json
+    python -m benchmarks.bench run --output /tmp/new.json --filter cnn_lstm
+    python -m benchmarks.bench compare benchmarks/baselines/cpu.json /tmp/new.json --threshold 0.10
+
+No baseline is committed: timings only mean something on the machine that
+produced them. The first `run` on the reference machine creates the baseline
+(commit it from there); later runs are compared against it.
+
+`compare` exits with status 1 if any case's median got slower than the threshold
+or a baseline case is missing from the current run; new cases are only reported.
+Only groups the current run selected count as missing, so a `--filter`ed run is
+compared against the matching part of a full baseline.
+The timed functions are imported from backend.inference and mod/, not copied.
+"""
+
+import os
+import sys
+import json
+import time
+import fnmatch
+import argparse
+import platform
+import datetime
+import statistics
+
+import cv2
+import numpy as np
+import torch
+
+from backend.models import CNN_LSTM
+from backend.inference import (transform, pil_from_bgr, decode_image, build_clip,
+                               violence_from_clip, detect_weapons)
+from mod import coarse_to_fine
+
+# =====================================================
+# CONFIG
+# =====================================================
+SEED = 0
+SEQ_LEN = 16
+RESOLUTIONS = {"480p": (640, 480), "720p": (1280, 720), "1080p": (1920, 1080), "4k": (3840, 2160)}
+CNN_LSTM_BATCH_SIZES = (1, 4)
+CNN_LSTM_SEQ_LENS = (8, 16)
+YOLO_IMGSZ = (320, 640, 1280)
+YOLO_CONFIG = "yolov8n.yaml"   # architecture only, no weight download
+DEFAULT_THRESHOLD = 0.10
+
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+# =====================================================
+# HELPERS
+# =====================================================
+def synthetic_frame(size, rng):
+    w, h = size
+    return rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+
+def sync():
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+
+def time_case(fn, warmup, repeats):
+    for _ in range(warmup):
+        fn()
+    sync()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        sync()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "median_ms": statistics.median(samples),
+        "mean_ms": statistics.fmean(samples),
+        "p90_ms": samples[min(len(samples) - 1, int(len(samples) * 0.9))],
+        "min_ms": samples[0],
+        "repeats": repeats,
+    }
+
+def load_violence_model():
+    torch.manual_seed(SEED)
+    model = CNN_LSTM(pretrained=False)
+    model.to(device)
+    model.eval()
+    return model
+
+# =====================================================
+# CASES
+# =====================================================
+# Each case builder yields (name, fn) pairs; heavy setup happens once per group.
+
+def transform_cases(rng):
+    for res in ("480p", "720p", "1080p"):
+        frame = synthetic_frame(RESOLUTIONS[res], rng)
+        yield f"transform/{res}", lambda frame=frame: transform(pil_from_bgr(frame))
+
+def cnn_lstm_cases(rng):
+    model = load_violence_model()
+    for batch in CNN_LSTM_BATCH_SIZES:
+        for seq_len in CNN_LSTM_SEQ_LENS:
+            clip = torch.randn(batch, seq_len, 3, 224, 224, device=device)
+
+            def run(clip=clip):
+                with torch.no_grad():
+                    model(clip)
+            yield f"cnn_lstm/b{batch}_t{seq_len}", run
+
+def predict_violence_cases(rng):
+    # The two steps backend.main.predict_violence_from_buffer runs (it only adds
+    # an uncontended lock and tracing spans), on a full buffer of camera frames
+    model = load_violence_model()
+    for res in ("480p", "1080p"):
+        buffer = [synthetic_frame(RESOLUTIONS[res], rng) for _ in range(SEQ_LEN)]
+        yield f"predict_violence_from_buffer/{res}", lambda buffer=buffer: violence_from_clip(
+            model, build_clip(buffer, device))
+
+def jpeg_decode_cases(rng):
+    # The decode step of backend.main.upload_frame
+    for res in ("480p", "720p", "1080p"):
+        ok, encoded = cv2.imencode(".jpg", synthetic_frame(RESOLUTIONS[res], rng))
+        yield f"jpeg_decode/{res}", lambda content=encoded.tobytes(): decode_image(content)
+
+def yolo_cases(rng):
+    try:
+        from ultralytics import YOLO
+    except ImportError:
+        print("⚠️ ultralytics not installed, skipping yolo cases")
+        return
+    torch.manual_seed(SEED)
+    model = YOLO(YOLO_CONFIG)
+    frame = synthetic_frame(RESOLUTIONS["1080p"], rng)
+    yield "yolo_predict/detect_weapons", lambda: detect_weapons(model, frame)
+    for imgsz in YOLO_IMGSZ:
+        yield f"yolo_predict/{imgsz}", lambda imgsz=imgsz: model.predict(
+            frame, imgsz=imgsz, conf=0.5, device=str(device), verbose=False)
+
+def detect_4k_cases(rng):
+    # Old single pass (ultralytics letterboxes 4K down to 640) vs mod/coarse_to_fine.py.
+    # Random weights may propose no candidates, so the fine pass is also timed
+    # on fixed crop counts to bound its cost when objects are present.
+    try:
+        from ultralytics import YOLO
+    except ImportError:
+        print("⚠️ ultralytics not installed, skipping detect_4k cases")
+        return
+    torch.manual_seed(SEED)
+    model = YOLO(YOLO_CONFIG)
+    frame = synthetic_frame(RESOLUTIONS["4k"], rng)
+    yield "detect_4k/single_pass", lambda: model.predict(frame, conf=0.7, verbose=False)
+    yield "detect_4k/coarse_to_fine", lambda: coarse_to_fine.detect_coarse_to_fine(frame, model, 0.7)
+    crop = coarse_to_fine.CROP_SIZE
+    for n in (1, 4, coarse_to_fine.MAX_CROPS):
+        windows = [(i * crop, 0, (i + 1) * crop, crop) for i in range(n // 2 + n % 2)]
+        windows += [(i * crop, crop, (i + 1) * crop, 2 * crop) for i in range(n // 2)]
+        yield f"detect_4k/fine_pass_{n}crops", lambda windows=windows: coarse_to_fine.fine_pass(
+            frame, model, windows, 0.7)
+
+CASE_GROUPS = {
+    "transform": transform_cases,
+    "cnn_lstm": cnn_lstm_cases,
+    "predict_violence_from_buffer": predict_violence_cases,
+    "jpeg_decode": jpeg_decode_cases,
+    "yolo_predict": yolo_cases,
+    "detect_4k": detect_4k_cases,
+}
+
+# =====================================================
+# COMMANDS
+# =====================================================
+def run(args):
+    rng = np.random.default_rng(SEED)
+    torch.manual_seed(SEED)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+        cv2.setNumThreads(args.threads)
+
+    results = {}
+    groups = [group for group in CASE_GROUPS if not args.filter or fnmatch.fnmatch(group, args.filter)]
+    for group in groups:
+        for name, fn in CASE_GROUPS[group](rng):
+            stats = time_case(fn, args.warmup, args.repeats)
+            results[name] = stats
+            print(f"{name:<40}{stats['median_ms']:>10.2f} ms  (p90 {stats['p90_ms']:.2f})")
+
+    report = {
+        "created": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "env": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "opencv": cv2.__version__,
+            "device": str(device),
+            "cpu_count": os.cpu_count(),
+            "torch_threads": torch.get_num_threads(),
+            "platform": platform.platform(),
+        },
+        "groups": groups,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Saved {len(results)} result(s) to {args.output}")
+
+def compare(args):
+    if not os.path.exists(args.baseline):
+        print(f"❌ No baseline at {args.baseline}; create it with: "
+              f"python -m benchmarks.bench run --output {args.baseline}")
+        return 1
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    if baseline["env"].get("device") != current["env"].get("device"):
+        print(f"⚠️ Device differs: {baseline['env'].get('device')} vs {current['env'].get('device')}")
+
+    # A renamed, skipped or crashing case must not hide a regression, so cases
+    # missing from the current run fail the comparison too - unless the run
+    # deliberately left out their group with --filter
+    ran = set(current.get("groups", CASE_GROUPS))
+    regressions = 0
+    missing = 0
+    print(f"{'case':<40}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, base in baseline["results"].items():
+        if name.split("/")[0] not in ran:
+            continue
+        cur = current["results"].get(name)
+        if cur is None:
+            print(f"{name:<40}{base['median_ms']:>10.2f}ms{'missing':>12}  ❌ MISSING")
+            missing += 1
+            continue
+        change = cur["median_ms"] / base["median_ms"] - 1
+        flag = ""
+        if change > args.threshold:
+            flag = "  ❌ REGRESSION"
+            regressions += 1
+        elif change < -args.threshold:
+            flag = "  ✅ faster"
+        print(f"{name:<40}{base['median_ms']:>10.2f}ms{cur['median_ms']:>10.2f}ms{change:>+10.1%}{flag}")
+
+    new = [name for name in current["results"] if name not in baseline["results"]]
+    for name in new:
+        print(f"{name:<40}{'new':>12}{current['results'][name]['median_ms']:>10.2f}ms  ⚠️ no baseline")
+
+    if regressions or missing:
+        print(f"\n❌ {regressions} case(s) regressed by more than {args.threshold:.0%}, "
+              f"{missing} case(s) missing from the current run")
+        return 1
+    print(f"\n✅ No regressions beyond {args.threshold:.0%}"
+          + (f" ({len(new)} new case(s) without a baseline)" if new else ""))
+    return 0
+
+# =====================================================
+# MAIN
+# =====================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CrimeWatch micro-benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run benchmarks and write a JSON report")
+    run_parser.add_argument("--output", required=True, help="Path of the JSON report")
+    run_parser.add_argument("--filter", help="Only run groups matching this glob, e.g. 'cnn_*'")
+    run_parser.add_argument("--warmup", type=int, default=3)
+    run_parser.add_argument("--repeats", type=int, default=20)
+    run_parser.add_argument("--threads", type=int, help="Pin torch/OpenCV thread count for stable numbers")
+
+    cmp_parser = sub.add_parser("compare", help="Compare a report against a baseline")
+    cmp_parser.add_argument("baseline")
+    cmp_parser.add_argument("current")
+    cmp_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help="Allowed slowdown of the median, as a fraction (default 0.10)")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
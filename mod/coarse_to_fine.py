@@ -0,0 +1,150 @@
+import math
+import cv2
+import torch
+from torchvision.ops import batched_nms
+# Imported as mod.<name> from the backend/benchmarks, top-level when run from mod/
+try:
+    from .span_tracer import span
+except ImportError:
+    from span_tracer import span
+
+# =====================================================
+# CONFIGURATION
+# =====================================================
+COARSE_SIZE = 960        # Longest side of the downscaled coarse frame
+CROP_SIZE = 640          # Side of each full-resolution crop (native pixels)
+CANDIDATE_CONF = 0.25    # Low threshold so the coarse pass over-proposes regions
+CROP_PADDING = 0.5       # Context added around a candidate, as a fraction of its size
+MAX_CROPS = 8            # Upper bound on crops per frame
+MAX_TILES = 4            # Candidates needing more crop_size tiles than this are left to the coarse pass
+IOU_THRESHOLD = 0.5      # NMS IoU when merging coarse + fine boxes
+
+
+# =====================================================
+# FUNCTION: Coarse pass on a downscaled frame
+# =====================================================
+def _coarse_pass(frame, model, scale, coarse_size):
+    h, w = frame.shape[:2]
+    small = cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))),
+                       interpolation=cv2.INTER_AREA)
+    results = model.predict(small, conf=CANDIDATE_CONF, imgsz=coarse_size, verbose=False)
+    boxes = results[0].boxes
+    if boxes is None or len(boxes) == 0:
+        return torch.zeros((0, 4)), torch.zeros(0), torch.zeros(0)
+    return boxes.xyxy.cpu() / scale, boxes.conf.cpu(), boxes.cls.cpu()
+
+
+# =====================================================
+# FUNCTION: Crop windows around candidate boxes
+# =====================================================
+def _axis_starts(lo, hi, crop_size, limit):
+    """Start offsets of crop_size tiles covering [lo, hi), clamped to [0, limit)"""
+    side = min(crop_size, limit)
+    # Extents are float pixels: an extent of 640.5 needs two 640 tiles
+    count = max(1, math.ceil((hi - lo) / side))
+    if count == 1:
+        return [int(min(max((lo + hi) / 2 - side / 2, 0), limit - side))]
+    step = (hi - lo - side) / (count - 1)
+    # Sub-pixel overshoot rounds to the same start; keep each tile once
+    return sorted({int(min(max(lo + i * step, 0), limit - side)) for i in range(count)})
+
+def crop_windows(candidates, frame_w, frame_h, crop_size):
+    """
+    Returns (x0, y0, x1, y1) windows of exactly crop_size pixels (clamped to the
+    frame), so crops are never shrunk again by the detector. A candidate whose
+    padded box fits in one window gets a centred crop; a larger one is tiled,
+    unless it needs more than MAX_TILES tiles - such objects are already well
+    resolved by the coarse pass. Windows already covering a candidate are reused.
+    """
+    windows = []
+    for x1, y1, x2, y2 in candidates.tolist():
+        if any(wx0 <= x1 and wy0 <= y1 and x2 <= wx1 and y2 <= wy1
+               for wx0, wy0, wx1, wy1 in windows):
+            continue
+        pad_w, pad_h = (x2 - x1) * CROP_PADDING / 2, (y2 - y1) * CROP_PADDING / 2
+        xs = _axis_starts(max(x1 - pad_w, 0), min(x2 + pad_w, frame_w), crop_size, frame_w)
+        ys = _axis_starts(max(y1 - pad_h, 0), min(y2 + pad_h, frame_h), crop_size, frame_h)
+        if len(xs) * len(ys) > MAX_TILES:
+            continue
+        for y0 in ys:
+            for x0 in xs:
+                window = (x0, y0, x0 + min(crop_size, frame_w), y0 + min(crop_size, frame_h))
+                if window not in windows:
+                    windows.append(window)
+        if len(windows) >= MAX_CROPS:
+            return windows[:MAX_CROPS]
+    return windows
+
+
+# =====================================================
+# FUNCTION: Fine pass on full-resolution crops
+# =====================================================
+def fine_pass(frame, model, windows, conf_threshold, crop_size=CROP_SIZE):
+    """Runs the detector on a batch of crops; returns boxes in full-frame pixels"""
+    xyxy, conf, cls = [], [], []
+    if not windows:
+        return xyxy, conf, cls
+    crops = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in windows]
+    with span("fine_pass", crops=len(crops)):
+        results = model.predict(crops, conf=conf_threshold, imgsz=crop_size, verbose=False)
+    for (x0, y0, _, _), result in zip(windows, results):
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            continue
+        offset = torch.tensor([x0, y0, x0, y0], dtype=boxes.xyxy.dtype)
+        xyxy.append(boxes.xyxy.cpu() + offset)
+        conf.append(boxes.conf.cpu())
+        cls.append(boxes.cls.cpu())
+    return xyxy, conf, cls
+
+
+# =====================================================
+# FUNCTION: Coarse-to-fine detection
+# =====================================================
+def detect_coarse_to_fine(frame, model, conf_threshold=0.7, classes=(0,),
+                          coarse_size=COARSE_SIZE, crop_size=CROP_SIZE):
+    """
+    Detects objects of `classes` in a high-resolution BGR frame.
+
+    A fast pass runs on a downscaled copy of the frame; candidates it finds (any
+    class, so person boxes also pull in crops) are re-examined on a batch of
+    native-resolution crop_size crops, see crop_windows. Boxes are mapped back to
+    full-frame coordinates and merged with NMS. Frames that already fit in
+    `coarse_size` take a single pass.
+
+    Returns an (N, 4) float tensor of xyxy boxes in full-frame pixels.
+    """
+    h, w = frame.shape[:2]
+    scale = coarse_size / max(h, w)
+    if scale >= 1:
+        results = model.predict(frame, conf=conf_threshold, verbose=False)
+        boxes = results[0].boxes
+        if boxes is None or len(boxes) == 0:
+            return torch.zeros((0, 4))
+        keep = torch.isin(boxes.cls.cpu(), torch.tensor(classes, dtype=boxes.cls.dtype))
+        return boxes.xyxy.cpu()[keep]
+
+    with span("coarse_pass"):
+        coarse_xyxy, coarse_conf, coarse_cls = _coarse_pass(frame, model, scale, coarse_size)
+    if len(coarse_xyxy) == 0:
+        return torch.zeros((0, 4))
+
+    all_xyxy, all_conf, all_cls = [coarse_xyxy], [coarse_conf], [coarse_cls]
+
+    windows = crop_windows(coarse_xyxy[coarse_conf.argsort(descending=True)], w, h, crop_size)
+    fine_xyxy, fine_conf, fine_cls = fine_pass(frame, model, windows, conf_threshold, crop_size)
+    all_xyxy += fine_xyxy
+    all_conf += fine_conf
+    all_cls += fine_cls
+
+    xyxy = torch.cat(all_xyxy).float()
+    conf = torch.cat(all_conf).float()
+    cls = torch.cat(all_cls)
+
+    keep = (conf >= conf_threshold) & torch.isin(cls, torch.tensor(classes, dtype=cls.dtype))
+    xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+    if len(xyxy) == 0:
+        return xyxy
+    with span("nms"):
+        keep = batched_nms(xyxy, conf, cls.long(), IOU_THRESHOLD)
+    return xyxy[keep]
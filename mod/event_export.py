@@ -0,0 +1,284 @@
+import os
+import json
+import queue
+import threading
+from collections import deque
+
+import cv2
+import torch
+from PIL import Image
+# Imported as mod.<name> from the backend/benchmarks, top-level when run from mod/
+try:
+    from .span_tracer import span
+except ImportError:
+    from span_tracer import span
+
+# =====================================================
+# CONFIGURATION
+# =====================================================
+CLIP_PADDING_SEC = 2.0                # Frames kept before/after each event, in seconds
+WRITER_QUEUE_SIZE = 64                # Max frames buffered between inference and the encoder
+WRITER_QUEUE_BYTES = 256 * 1024 ** 2  # Max raw bytes in that queue (about 10 frames at 4K)
+PREROLL_MAX_BYTES = 512 * 1024 ** 2   # Max raw bytes held for clip pre-roll (about 20 frames at 4K)
+OUTPUT_MODES = ("video", "events")
+
+
+# =====================================================
+# FUNCTION: Frames that fit in a memory budget
+# =====================================================
+def frames_within(frame_size, max_bytes, max_frames=None):
+    """How many raw BGR frames of `frame_size` (w, h) fit in `max_bytes`, at least 1"""
+    w, h = frame_size
+    count = max(1, max_bytes // max(1, w * h * 3))
+    return count if max_frames is None else min(count, max_frames)
+
+
+# =====================================================
+# CLASS: NDJSON Detection Sidecar
+# =====================================================
+class DetectionSidecar:
+    """
+    Writes one JSON object per line: per-frame boxes and per-window violence
+    probabilities. Cheap to append to and to stream back in with `json.loads`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+
+    def frame(self, frame_idx, boxes, **fields):
+        self.write({"type": "frame", "frame": frame_idx,
+                    "boxes": [[int(v) for v in box] for box in boxes], **fields})
+
+    def window(self, start_frame, end_frame, label, prob):
+        self.write({"type": "window", "start": start_frame, "end": end_frame,
+                    "label": label, "prob": float(prob)})
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# =====================================================
+# CLASS: Background Video Writer
+# =====================================================
+class BackgroundVideoWriter:
+    """
+    Owns cv2.VideoWriter instances on a worker thread so encoding overlaps inference.
+    The bounded queue applies back-pressure instead of buffering a whole video in RAM;
+    by default it holds at most WRITER_QUEUE_BYTES of raw frames.
+
+    An encoder error is kept and re-raised from the next open/write/close_file/stop.
+    The worker keeps draining the queue after an error, so producers never block on it.
+    """
+
+    def __init__(self, fps, frame_size, fourcc="mp4v", queue_size=None):
+        self.fps = fps
+        self.frame_size = frame_size
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        if queue_size is None:
+            queue_size = frames_within(frame_size, WRITER_QUEUE_BYTES, WRITER_QUEUE_SIZE)
+        self.error = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        writer = None
+        while True:
+            cmd, arg = self._queue.get()
+            if cmd == "stop":
+                break
+            if self.error is not None:
+                continue
+            try:
+                if cmd == "open":
+                    writer = cv2.VideoWriter(arg, self.fourcc, self.fps, self.frame_size)
+                    if not writer.isOpened():
+                        writer = None
+                        raise IOError(f"Could not open video writer for {arg}")
+                elif cmd == "frame":
+                    with span("encode"):
+                        writer.write(arg)
+                elif cmd == "close":
+                    writer.release()
+                    writer = None
+            except Exception as e:
+                self.error = e
+        if writer is not None:
+            try:
+                writer.release()
+            except Exception as e:
+                self.error = self.error or e
+
+    def _check(self):
+        if self.error is not None:
+            raise RuntimeError(f"Background video writer failed: {self.error}") from self.error
+
+    def open(self, path):
+        self._check()
+        self._queue.put(("open", path))
+
+    def write(self, frame):
+        self._check()
+        self._queue.put(("frame", frame))
+
+    def close_file(self):
+        self._check()
+        self._queue.put(("close", None))
+
+    def stop(self):
+        self._queue.put(("stop", None))
+        self._thread.join()
+        self._check()
+
+
+# =====================================================
+# CLASS: Event Clip Writer
+# =====================================================
+class EventClipWriter:
+    """
+    Encodes only padded clips around event frames. A rolling pre-roll buffer holds
+    the last `pad_frames` frames; a clip stays open until `pad_frames` frames pass
+    without another event, so nearby events merge into one clip.
+
+    Pre-roll frames are raw, so the buffer is also capped at PREROLL_MAX_BYTES: at
+    4K/24 fps that is under one second of lead-in instead of `pad_frames`. The tail
+    after an event is streamed to the encoder and always gets the full `pad_frames`.
+    """
+
+    def __init__(self, output_prefix, fps, frame_size, pad_frames=None, fourcc="mp4v"):
+        self.output_prefix = output_prefix
+        self.pad_frames = pad_frames if pad_frames is not None else int(CLIP_PADDING_SEC * fps)
+        self._writer = BackgroundVideoWriter(fps, frame_size, fourcc)
+        self._preroll = deque(maxlen=min(self.pad_frames, frames_within(frame_size, PREROLL_MAX_BYTES)))
+        self._remaining = 0
+        self._clip_start = None
+        self.clips = []   # (path, start_frame, end_frame)
+
+    def push(self, frame_idx, frame, is_event):
+        if is_event:
+            if self._clip_start is None:
+                self._clip_start = frame_idx - len(self._preroll)
+                path = f"{self.output_prefix}_clip{len(self.clips):03d}_{self._clip_start}.mp4"
+                self.clips.append([path, self._clip_start, frame_idx])
+                self._writer.open(path)
+                while self._preroll:
+                    self._writer.write(self._preroll.popleft())
+            self._remaining = self.pad_frames
+
+        if self._clip_start is None:
+            self._preroll.append(frame)
+            return
+
+        self._writer.write(frame)
+        self.clips[-1][2] = frame_idx
+        if not is_event:
+            self._remaining -= 1
+            if self._remaining <= 0:
+                self._writer.close_file()
+                self._clip_start = None
+
+    def close(self):
+        if self._clip_start is not None:
+            self._writer.close_file()
+            self._clip_start = None
+        self._writer.stop()
+        return [tuple(clip) for clip in self.clips]
+
+
+# =====================================================
+# FUNCTION: Sliding-window violence scores
+# =====================================================
+def violence_windows(video_path, model, transform, device, seq_len=16, frame_rate=5, stride=None):
+    """
+    Yields (start_frame, end_frame, prob) for windows of `seq_len` frames sampled
+    every `frame_rate` frames, advancing by `stride` samples (default half a window).
+    The tail of the video, or a video shorter than one window, is scored as a
+    final partial window. Only `seq_len` preprocessed frames are held at a time.
+    """
+    stride = stride or max(1, seq_len // 2)
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"❌ Could not open video file: {video_path}")
+
+    tensors = deque(maxlen=seq_len)
+    indices = deque(maxlen=seq_len)
+    since_last = 0
+    frame_idx = 0
+
+    def score():
+        clip = torch.stack(list(tensors)).unsqueeze(0).to(device)
+        with span("cnn_lstm"), torch.no_grad():
+            return float(model(clip).item())
+
+    try:
+        while True:
+            with span("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_idx % frame_rate == 0:
+                with span("preprocess"):
+                    img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    tensors.append(transform(Image.fromarray(img)))
+                indices.append(frame_idx)
+                since_last += 1
+                if len(tensors) == seq_len and since_last >= stride:
+                    since_last = 0
+                    yield indices[0], frame_idx, score()
+            frame_idx += 1
+    finally:
+        cap.release()
+
+    if since_last and tensors:
+        yield indices[0], max(frame_idx - 1, indices[-1]), score()
+
+
+# =====================================================
+# CLASS: Membership in violent windows
+# =====================================================
+class FrameIntervals:
+    """
+    Answers "is this frame inside one of the (start, end) intervals?" for frame
+    indices that only ever increase, in O(1) amortized per frame. Intervals may
+    carry a value as (start, end, value); overlapping ones keep the largest, and
+    `get` returns it for frames inside.
+    """
+
+    def __init__(self, intervals):
+        merged = []
+        for start, end, *value in sorted(intervals):
+            value = value[0] if value else True
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+                merged[-1][2] = max(merged[-1][2], value)
+            else:
+                merged.append([start, end, value])
+        self._intervals = merged
+        self._pos = 0
+
+    def get(self, frame_idx, default=None):
+        while self._pos < len(self._intervals) and self._intervals[self._pos][1] < frame_idx:
+            self._pos += 1
+        if self._pos < len(self._intervals) and self._intervals[self._pos][0] <= frame_idx:
+            return self._intervals[self._pos][2]
+        return default
+
+    def __contains__(self, frame_idx):
+        return self.get(frame_idx) is not None
+
+
+# =====================================================
+# FUNCTION: Sidecar path for an output video
+# =====================================================
+def sidecar_path(output_path):
+    return os.path.splitext(output_path)[0] + ".ndjson"
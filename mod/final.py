@@ -6,6 +6,11 @@ from torchvision import transforms
 from PIL import Image
 from ultralytics import YOLO
 from models import CNN_LSTM
+from coarse_to_fine import detect_coarse_to_fine
+from event_export import (OUTPUT_MODES, BackgroundVideoWriter, DetectionSidecar,
+                          EventClipWriter, FrameIntervals, sidecar_path, violence_windows)
+import span_tracer
+from span_tracer import span
 
 # =====================================================
 # CONFIGURATION
@@ -58,13 +63,15 @@ def load_clip_from_video(video_path, seq_len=16, frame_rate=5):
     frame_count = 0
 
     while True:
-        ret, frame = cap.read()
+        with span("decode"):
+            ret, frame = cap.read()
         if not ret:
             break
         if frame_count % frame_rate == 0:
-            img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(img)
-            img = transform(img)
+            with span("preprocess"):
+                img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                img = Image.fromarray(img)
+                img = transform(img)
             frames.append(img)
         frame_count += 1
 
@@ -82,8 +89,9 @@ def load_clip_from_video(video_path, seq_len=16, frame_rate=5):
 # FUNCTION: Predict Violence
 # =====================================================
 def predict_violence(video_path):
-    clip = load_clip_from_video(video_path, SEQ_LEN, FRAME_RATE)
-    with torch.no_grad():
+    with span("load_clip"):
+        clip = load_clip_from_video(video_path, SEQ_LEN, FRAME_RATE)
+    with span("cnn_lstm"), torch.no_grad():
         prob = violence_model(clip).item()
     label = "Violence" if prob >= 0.5 else "Non-Violence"
     return label, prob
@@ -91,10 +99,9 @@ def predict_violence(video_path):
 # =====================================================
 # FUNCTION: Process Frame for Weapon Detection
 # =====================================================
-def process_frame_weapon(frame, model, conf_threshold=0.7):
-    results = model.predict(frame, conf=conf_threshold, verbose=False)
-    boxes = results[0].boxes
-    weapon_boxes = [b for b, cls in zip(boxes.xyxy, boxes.cls) if int(cls) == 0] if boxes else []
+def process_frame_weapon(frame, model, conf_threshold=0.7, draw=True):
+    with span("yolo"):
+        weapon_boxes = detect_coarse_to_fine(frame, model, conf_threshold)
 
     if len(weapon_boxes) > 0:
         label = "Weapon Detected"
@@ -103,20 +110,36 @@ def process_frame_weapon(frame, model, conf_threshold=0.7):
         label = "No Weapon"
         color = (0, 255, 0)
 
-    for box in weapon_boxes:
-        x1, y1, x2, y2 = map(int, box)
-        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-    return frame, len(weapon_boxes) > 0, label
+    if draw:
+        with span("overlay"):
+            for box in weapon_boxes:
+                x1, y1, x2, y2 = map(int, box)
+                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+    return frame, len(weapon_boxes) > 0, label, weapon_boxes.tolist()
 
 # =====================================================
 # MAIN PROCESSING FUNCTION
 # =====================================================
-def process_video(video_path, output_path):
+def process_video(video_path, output_path, output_mode="video", clips=False):
+    """
+    output_mode="video": re-encode every frame with overlays (original behaviour).
+    output_mode="events": write an NDJSON detection sidecar only; with clips=True,
+    also encode short padded clips around weapon frames and violent windows.
+    """
     print(f"\n🎥 Processing: {os.path.basename(video_path)}")
 
-    # Predict violence for the entire video
+    # Video mode scores one clip sampled across the whole video; events mode
+    # scores sliding windows so only the violent stretches become events
+    windows = None
     try:
-        violence_label, violence_prob = predict_violence(video_path)
+        if output_mode == "video":
+            violence_label, violence_prob = predict_violence(video_path)
+        else:
+            with span("violence_windows"):
+                windows = list(violence_windows(video_path, violence_model, transform, device,
+                                                SEQ_LEN, FRAME_RATE))
+            violence_prob = max((prob for _, _, prob in windows), default=0.0)
+            violence_label = "Violence" if violence_prob >= 0.5 else "Non-Violence"
     except Exception as e:
         print(f"❌ Error processing violence for {video_path}: {e}")
         return
@@ -131,37 +154,88 @@ def process_video(video_path, output_path):
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = int(cap.get(cv2.CAP_PROP_FPS)) or 20
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    writer = None
+    clip_writer = None
+    sidecar = None
+    violent_frames = None
+    if output_mode == "video":
+        writer = BackgroundVideoWriter(fps, (width, height))
+        writer.open(output_path)
+    else:
+        sidecar = DetectionSidecar(sidecar_path(output_path))
+        sidecar.write({"type": "video", "source": video_path, "fps": fps,
+                       "width": width, "height": height, "frames": total_frames})
+        for start, end, prob in windows:
+            sidecar.window(start, end, "Violence" if prob >= 0.5 else "Non-Violence", prob)
+        violent_frames = FrameIntervals([(start, end, prob) for start, end, prob in windows if prob >= 0.5])
+        if clips:
+            clip_writer = EventClipWriter(os.path.splitext(output_path)[0], fps, (width, height))
+    draw_overlay = writer is not None or clip_writer is not None
 
-    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
     weapon_detected = False
+    frame_idx = 0
 
     while True:
-        ret, frame = cap.read()
+        with span("decode"):
+            ret, frame = cap.read()
         if not ret:
             break
 
-        frame, weapon_in_frame, weapon_label = process_frame_weapon(frame, weapon_model, CONF_THRESHOLD)
-        if weapon_in_frame:
-            weapon_detected = True
-
-        # Check DANGER condition
-        danger = violence_detected or weapon_detected
-        danger_label = "🚨 DANGER" if danger else "✅ SAFE"
-        danger_color = (0, 0, 255) if danger else (0, 255, 0)
-
-        # Overlay text
-        text1 = f"{violence_label.upper()} ({violence_prob:.2f})"
-        text2 = f"{weapon_label.upper()}"
-        cv2.putText(frame, text1, (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.2,
-                    (0, 0, 255) if violence_label == "Violence" else (0, 255, 0), 3)
-        cv2.putText(frame, text2, (20, 110), cv2.FONT_HERSHEY_SIMPLEX, 1.0,
-                    (0, 0, 255) if weapon_in_frame else (0, 255, 0), 2)
-        cv2.putText(frame, danger_label, (20, 170), cv2.FONT_HERSHEY_SIMPLEX, 1.3, danger_color, 3)
-
-        out.write(frame)
+        with span("frame", index=frame_idx):
+            frame, weapon_in_frame, weapon_label, weapon_boxes = process_frame_weapon(
+                frame, weapon_model, CONF_THRESHOLD, draw=draw_overlay)
+            if weapon_in_frame:
+                weapon_detected = True
+
+            # Check DANGER condition: events mode labels each frame by the
+            # violent window it falls in, video mode by the whole-video score
+            if violent_frames is not None:
+                frame_prob = violent_frames.get(frame_idx)
+                frame_violent = frame_prob is not None
+                violence_text = f"VIOLENCE ({frame_prob:.2f})" if frame_violent else "NON-VIOLENCE"
+                danger = frame_violent or weapon_in_frame
+            else:
+                frame_violent = violence_detected
+                violence_text = f"{violence_label.upper()} ({violence_prob:.2f})"
+                danger = violence_detected or weapon_detected
+
+            if sidecar is not None and weapon_in_frame:
+                sidecar.frame(frame_idx, weapon_boxes, label=weapon_label)
+
+            if draw_overlay:
+                with span("overlay"):
+                    danger_label = "🚨 DANGER" if danger else "✅ SAFE"
+                    danger_color = (0, 0, 255) if danger else (0, 255, 0)
+
+                    # Overlay text
+                    text1 = violence_text
+                    text2 = f"{weapon_label.upper()}"
+                    cv2.putText(frame, text1, (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.2,
+                                (0, 0, 255) if frame_violent else (0, 255, 0), 3)
+                    cv2.putText(frame, text2, (20, 110), cv2.FONT_HERSHEY_SIMPLEX, 1.0,
+                                (0, 0, 255) if weapon_in_frame else (0, 255, 0), 2)
+                    cv2.putText(frame, danger_label, (20, 170), cv2.FONT_HERSHEY_SIMPLEX, 1.3, danger_color, 3)
+
+            # Encoding itself runs on the writer thread ("encode" spans);
+            # time here is back-pressure from a full queue
+            with span("write_queue"):
+                if writer is not None:
+                    writer.write(frame)
+                elif clip_writer is not None:
+                    clip_writer.push(frame_idx, frame, weapon_in_frame or frame_violent)
+
+        frame_idx += 1
 
     cap.release()
-    out.release()
+    if writer is not None:
+        writer.stop()
+    if clip_writer is not None:
+        for clip_path, start, end in clip_writer.close():
+            sidecar.write({"type": "clip", "path": clip_path, "start": start, "end": end})
+    if sidecar is not None:
+        sidecar.close()
 
     # Final status summary
     if violence_detected or weapon_detected:
@@ -169,13 +243,26 @@ def process_video(video_path, output_path):
     else:
         alert_status = "✅ SAFE"
 
-    print(f"✅ Saved: {output_path}")
+    print(f"✅ Saved: {output_path if writer is not None else sidecar.path}")
     print(f"🧠 Violence: {violence_label} ({violence_prob:.2f}) | 🔫 Weapon: {'Yes' if weapon_detected else 'No'} | ⚠️ Status: {alert_status}")
 
 # =====================================================
 # RUN PIPELINE FOR ALL VIDEOS IN INPUT DIR
 # =====================================================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output-mode", choices=OUTPUT_MODES, default="video",
+                        help="'video' re-encodes every frame, 'events' writes an NDJSON sidecar")
+    parser.add_argument("--clips", action="store_true",
+                        help="With --output-mode events, also encode padded clips around detections")
+    parser.add_argument("--profile", metavar="TRACE_JSON",
+                        help="Record pipeline spans and write a Chrome trace to this path")
+    parser.add_argument("--torch-profile", action="store_true",
+                        help="With --profile, also run torch.profiler (written to <trace>.torch.json)")
+    args = parser.parse_args()
+    if args.profile:
+        span_tracer.enable(args.profile, torch_profiler=args.torch_profile)
+
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
     videos = [f for f in os.listdir(INPUT_DIR) if f.lower().endswith((".mp4", ".avi", ".mov", ".mkv"))]
@@ -188,6 +275,12 @@ if __name__ == "__main__":
     for video_name in videos:
         input_path = os.path.join(INPUT_DIR, video_name)
         output_path = os.path.join(OUTPUT_DIR, f"output_{video_name}")
-        process_video(input_path, output_path)
+        with span("video", file=video_name):
+            process_video(input_path, output_path, args.output_mode, args.clips)
+
+    if args.profile:
+        span_tracer.tracer.write(args.profile)
+        print(f"\n⏱️ Trace saved to {args.profile}")
+        print(span_tracer.tracer.summary())
 
     print("\n🏁 All videos processed successfully!")
@@ -1,7 +1,14 @@
 # weapon_video_detection.py
 
+import os
+import argparse
 import cv2
 from ultralytics import YOLO
+from coarse_to_fine import detect_coarse_to_fine
+from event_export import (OUTPUT_MODES, BackgroundVideoWriter, DetectionSidecar,
+                          EventClipWriter, sidecar_path)
+import span_tracer
+from span_tracer import span
 
 # =======================
 # USER CONFIGURATION
@@ -19,12 +26,11 @@ model = YOLO(MODEL_PATH)
 # =======================
 # FUNCTION TO PROCESS FRAME
 # =======================
-def process_frame(frame, model, conf_threshold=0.6):
-    results = model.predict(frame, conf=conf_threshold)
-    boxes = results[0].boxes
-
-    # Filter boxes for class 0 (weapon)
-    weapon_boxes = [b for b, cls in zip(boxes.xyxy, boxes.cls) if int(cls) == 0] if boxes else []
+def process_frame(frame, model, conf_threshold=0.6, draw=True):
+    # Coarse pass on a downscaled frame, full-resolution crops around candidates,
+    # merged back to full-frame boxes for class 0 (weapon)
+    with span("yolo"):
+        weapon_boxes = detect_coarse_to_fine(frame, model, conf_threshold)
 
     if len(weapon_boxes) > 0:
         label = "Weapon Detected"
@@ -33,15 +39,32 @@ def process_frame(frame, model, conf_threshold=0.6):
         label = "No Weapon"
         color = (0, 255, 0)  # Green
 
-    # Draw label on frame
-    cv2.putText(frame, label, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.2, color, 2)
+    if draw:
+        with span("overlay"):
+            # Draw label on frame
+            cv2.putText(frame, label, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.2, color, 2)
+
+            # Draw bounding boxes
+            for box in weapon_boxes:
+                x1, y1, x2, y2 = map(int, box)
+                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
 
-    # Draw bounding boxes
-    for box in weapon_boxes:
-        x1, y1, x2, y2 = map(int, box)
-        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+    return frame, len(weapon_boxes) > 0, weapon_boxes.tolist()
 
-    return frame, len(weapon_boxes) > 0
+# =======================
+# OUTPUT MODE
+# =======================
+# 'video' re-encodes every frame; 'events' writes an NDJSON sidecar and,
+# with --clips, encodes padded clips around detections only
+parser = argparse.ArgumentParser()
+parser.add_argument("--output-mode", choices=OUTPUT_MODES, default="video")
+parser.add_argument("--clips", action="store_true")
+parser.add_argument("--no-display", action="store_true", help="Skip the live preview window")
+parser.add_argument("--profile", metavar="TRACE_JSON", help="Write a Chrome trace of pipeline stages")
+parser.add_argument("--torch-profile", action="store_true", help="Also run torch.profiler with --profile")
+args = parser.parse_args()
+if args.profile:
+    span_tracer.enable(args.profile, torch_profiler=args.torch_profile)
 
 # =======================
 # VIDEO PROCESSING
@@ -55,33 +78,69 @@ width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
 height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 fps = int(cap.get(cv2.CAP_PROP_FPS))
 
-# VideoWriter to save output
-out = cv2.VideoWriter(OUTPUT_VIDEO, cv2.VideoWriter_fourcc(*'XVID'), fps, (width, height))
+# Encoding runs on a background thread so it overlaps inference
+out = None
+clip_writer = None
+sidecar = None
+if args.output_mode == "video":
+    out = BackgroundVideoWriter(fps, (width, height), fourcc='XVID')
+    out.open(OUTPUT_VIDEO)
+else:
+    sidecar = DetectionSidecar(sidecar_path(OUTPUT_VIDEO))
+    sidecar.write({"type": "video", "source": INPUT_VIDEO, "fps": fps,
+                   "width": width, "height": height})
+    if args.clips:
+        clip_writer = EventClipWriter(os.path.splitext(OUTPUT_VIDEO)[0], fps, (width, height))
+draw = out is not None or clip_writer is not None or not args.no_display
 
 weapon_detected_in_video = False
+frame_idx = 0
 
 while True:
-    ret, frame = cap.read()
+    with span("decode"):
+        ret, frame = cap.read()
     if not ret:
         break
 
-    # Process frame
-    frame, weapon_in_frame = process_frame(frame, model, CONF_THRESHOLD)
-    if weapon_in_frame:
-        weapon_detected_in_video = True
-
-    # Write to output
-    out.write(frame)
+    with span("frame", index=frame_idx):
+        # Process frame ("yolo" and "overlay" spans are inside)
+        frame, weapon_in_frame, weapon_boxes = process_frame(frame, model, CONF_THRESHOLD, draw=draw)
+        if weapon_in_frame:
+            weapon_detected_in_video = True
+
+        # Write to output (encoding is traced as "encode" on the writer thread)
+        with span("write_queue"):
+            if out is not None:
+                out.write(frame)
+            else:
+                if weapon_in_frame:
+                    sidecar.frame(frame_idx, weapon_boxes)
+                if clip_writer is not None:
+                    clip_writer.push(frame_idx, frame, weapon_in_frame)
+    frame_idx += 1
 
     # Display live (optional)
-    cv2.imshow('Weapon Detection', frame)
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+    if not args.no_display:
+        cv2.imshow('Weapon Detection', frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
 
 cap.release()
-out.release()
+if out is not None:
+    out.stop()
+if clip_writer is not None:
+    for clip_path, start, end in clip_writer.close():
+        sidecar.write({"type": "clip", "path": clip_path, "start": start, "end": end})
+if sidecar is not None:
+    sidecar.close()
+    OUTPUT_VIDEO = sidecar.path
 cv2.destroyAllWindows()
 
+if args.profile:
+    span_tracer.tracer.write(args.profile)
+    print(f"⏱️ Trace saved to {args.profile}")
+    print(span_tracer.tracer.summary())
+
 print(f"✅ Processed video saved at: {OUTPUT_VIDEO}")
 
 # =======================
@@ -5,6 +5,10 @@ import argparse
 from torchvision import transforms
 from PIL import Image
 from models import CNN_LSTM
+from event_export import (OUTPUT_MODES, BackgroundVideoWriter, DetectionSidecar,
+                          EventClipWriter, FrameIntervals, sidecar_path, violence_windows)
+import span_tracer
+from span_tracer import span
 
 # Device
 device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -30,14 +34,16 @@ def load_clip_from_video(video_path, seq_len=16, frame_rate=5):
     frame_count = 0
 
     while True:
-        ret, frame = cap.read()
+        with span("decode"):
+            ret, frame = cap.read()
         if not ret:
             break
         if frame_count % frame_rate == 0:
-            # Convert frame (BGR → RGB)
-            img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(img)
-            img = transform(img)
+            with span("preprocess"):
+                # Convert frame (BGR → RGB)
+                img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                img = Image.fromarray(img)
+                img = transform(img)
             frames.append(img)
         frame_count += 1
 
@@ -58,9 +64,10 @@ def predict(video_path, seq_len=16, frame_rate=5):
     """
     Predict violence vs non-violence directly from video.
     """
-    clip = load_clip_from_video(video_path, seq_len, frame_rate)
+    with span("load_clip"):
+        clip = load_clip_from_video(video_path, seq_len, frame_rate)
 
-    with torch.no_grad():
+    with span("cnn_lstm"), torch.no_grad():
         prob = model(clip).item()
 
     label = "violence" if prob >= 0.5 else "non_violence"
@@ -75,7 +82,17 @@ if __name__ == "__main__":
     parser.add_argument("--input", default=INPUT_VIDEO, help="Path to input video (.mp4)")
     parser.add_argument("--seq_len", type=int, default=16, help="Number of frames per clip")
     parser.add_argument("--frame_rate", type=int, default=5, help="Sample every Nth frame")
+    parser.add_argument("--output_mode", choices=OUTPUT_MODES, default="video",
+                        help="'video' re-encodes every frame, 'events' writes an NDJSON sidecar")
+    parser.add_argument("--clips", action="store_true",
+                        help="With --output_mode events, also encode padded clips around violent windows")
+    parser.add_argument("--profile", metavar="TRACE_JSON",
+                        help="Record pipeline spans and write a Chrome trace to this path")
+    parser.add_argument("--torch_profile", action="store_true",
+                        help="With --profile, also run torch.profiler (written to <trace>.torch.json)")
     args = parser.parse_args()
+    if args.profile:
+        span_tracer.enable(args.profile, torch_profiler=args.torch_profile)
 
     # Load trained model
     model = CNN_LSTM()
@@ -83,26 +100,64 @@ if __name__ == "__main__":
     model.to(device)
     model.eval()
 
-    # Run prediction
-    label, prob = predict(args.input, seq_len=args.seq_len, frame_rate=args.frame_rate)
-    print(f"Prediction: {label} (confidence={prob:.4f})")
-
-    # Overlay result on video and save
     cap = cv2.VideoCapture(args.input)
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(OUTPUT_VIDEO, fourcc, 20.0,
-                          (int(cap.get(3)), int(cap.get(4))))
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        text = f"{label.upper()} ({prob:.2f})"
-        color = (0, 0, 255) if label == "violence" else (0, 255, 0)
-        cv2.putText(frame, text, (30, 60), cv2.FONT_HERSHEY_SIMPLEX,
-                    1.5, color, 3, cv2.LINE_AA)
-        out.write(frame)
-
-    cap.release()
-    out.release()
-    print(f"✅ Output video saved to {OUTPUT_VIDEO}")
+    size = (int(cap.get(3)), int(cap.get(4)))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    if args.output_mode == "events":
+        # Sliding windows instead of one whole-video score, so clips cover
+        # only the violent stretches; frames are decoded again only for clips
+        windows = list(violence_windows(args.input, model, transform, device,
+                                        args.seq_len, args.frame_rate))
+        violent = [(start, end) for start, end, p in windows if p >= 0.5]
+        print(f"Prediction: {len(violent)} violent window(s) out of {len(windows)}")
+        with DetectionSidecar(sidecar_path(OUTPUT_VIDEO)) as sidecar:
+            sidecar.write({"type": "video", "source": args.input, "frames": total_frames})
+            for start, end, p in windows:
+                sidecar.window(start, end, "violence" if p >= 0.5 else "non_violence", p)
+            if args.clips and violent:
+                violent_frames = FrameIntervals(violent)
+                clip_writer = EventClipWriter(os.path.splitext(OUTPUT_VIDEO)[0], 20.0, size)
+                frame_idx = 0
+                while True:
+                    with span("decode"):
+                        ret, frame = cap.read()
+                    if not ret:
+                        break
+                    with span("write_queue"):
+                        clip_writer.push(frame_idx, frame, frame_idx in violent_frames)
+                    frame_idx += 1
+                for clip_path, start, end in clip_writer.close():
+                    sidecar.write({"type": "clip", "path": clip_path, "start": start, "end": end})
+        cap.release()
+        print(f"✅ Detections saved to {sidecar.path}")
+    else:
+        # Run prediction
+        label, prob = predict(args.input, seq_len=args.seq_len, frame_rate=args.frame_rate)
+        print(f"Prediction: {label} (confidence={prob:.4f})")
+
+        # Overlay result on video and save (encoding on a background thread)
+        out = BackgroundVideoWriter(20.0, size)
+        out.open(OUTPUT_VIDEO)
+
+        while True:
+            with span("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+            with span("overlay"):
+                text = f"{label.upper()} ({prob:.2f})"
+                color = (0, 0, 255) if label == "violence" else (0, 255, 0)
+                cv2.putText(frame, text, (30, 60), cv2.FONT_HERSHEY_SIMPLEX,
+                            1.5, color, 3, cv2.LINE_AA)
+            with span("write_queue"):
+                out.write(frame)
+
+        cap.release()
+        out.stop()
+        print(f"✅ Output video saved to {OUTPUT_VIDEO}")
+
+    if args.profile:
+        span_tracer.tracer.write(args.profile)
+        print(f"⏱️ Trace saved to {args.profile}")
+        print(span_tracer.tracer.summary())
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import threading
+from collections import deque, defaultdict
+from contextlib import nullcontext
+
+# =====================================================
+# CLASS: Span Tracer
+# =====================================================
+class Tracer:
+    """
+    Records nested timing spans as Chrome trace events ("ph": "X"), viewable in
+    chrome://tracing or https://ui.perfetto.dev. Spans on the same thread nest by
+    time, so a "frame" span shows its "decode" / "yolo" / "encode" children.
+
+    With torch_trace_path set, torch.profiler runs too and every span is also a
+    torch.profiler.record_function, so operator-level events in the torch trace
+    carry the same stage names. torch_steps bounds the capture to that many
+    step() calls (needed in long-running processes, where operator events would
+    otherwise grow without limit); None records until write().
+    """
+
+    def __init__(self, enabled=True, torch_trace_path=None, torch_steps=None, max_events=None):
+        self.enabled = enabled
+        self.events = deque(maxlen=max_events)
+        self._origin_ns = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._torch_profiler = None
+        self._record_function = None
+        self._step_lock = threading.Lock()
+        if enabled and torch_trace_path:
+            import torch
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            schedule = None
+            if torch_steps:
+                schedule = torch.profiler.schedule(wait=0, warmup=1, active=torch_steps, repeat=1)
+            self._torch_profiler = torch.profiler.profile(
+                activities=activities, record_shapes=True, schedule=schedule,
+                on_trace_ready=lambda prof: prof.export_chrome_trace(torch_trace_path))
+            self._torch_profiler.__enter__()
+            self._record_function = torch.profiler.record_function
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return nullcontext()
+        return _Span(self, name, args)
+
+    def _add(self, name, start_ns, end_ns, args):
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": (start_ns - self._origin_ns) / 1000,
+            "dur": (end_ns - start_ns) / 1000,
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def step(self):
+        """Marks one unit of work (a frame, a request) for the torch.profiler schedule"""
+        if self._torch_profiler is not None:
+            with self._step_lock:
+                self._torch_profiler.step()
+
+    def write(self, path):
+        """Writes the span trace and finishes the torch.profiler capture, if any"""
+        thread_names = [{"name": "thread_name", "ph": "M", "pid": self._pid, "tid": t.ident,
+                         "args": {"name": t.name}} for t in threading.enumerate()]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": thread_names + list(self.events),
+                       "displayTimeUnit": "ms"}, f)
+        if self._torch_profiler is not None:
+            self._torch_profiler.__exit__(None, None, None)
+            self._torch_profiler = None
+
+    def summary(self):
+        """Per-stage table: count, total, mean and max in milliseconds"""
+        stats = defaultdict(list)
+        for event in list(self.events):
+            stats[event["name"]].append(event["dur"] / 1000)
+        rows = sorted(stats.items(), key=lambda kv: sum(kv[1]), reverse=True)
+        lines = [f"{'stage':<24}{'count':>8}{'total ms':>12}{'mean ms':>10}{'max ms':>10}"]
+        for name, durs in rows:
+            lines.append(f"{name:<24}{len(durs):>8}{sum(durs):>12.1f}"
+                         f"{sum(durs) / len(durs):>10.2f}{max(durs):>10.2f}")
+        return "\n".join(lines)
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start_ns", "record")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.record = None
+
+    def __enter__(self):
+        if self.tracer._record_function is not None:
+            self.record = self.tracer._record_function(self.name)
+            self.record.__enter__()
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end_ns = time.perf_counter_ns()
+        if self.record is not None:
+            self.record.__exit__(*exc)
+        self.tracer._add(self.name, self.start_ns, end_ns, self.args)
+        return False
+
+# =====================================================
+# MODULE-LEVEL TRACER
+# =====================================================
+# Disabled by default: span() then costs one attribute check
+tracer = Tracer(enabled=False)
+
+def enable(trace_path, torch_profiler=False, torch_steps=None, max_events=None):
+    """torch.profiler output, if enabled, goes to `<trace_path stem>.torch.json`"""
+    global tracer
+    torch_trace_path = os.path.splitext(trace_path)[0] + ".torch.json" if torch_profiler else None
+    tracer = Tracer(enabled=True, torch_trace_path=torch_trace_path, torch_steps=torch_steps,
+                    max_events=max_events)
+    return tracer
+
+def span(name, **args):
+    return tracer.span(name, **args)
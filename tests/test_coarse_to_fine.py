@@ -0,0 +1,105 @@
+import math
+
+import pytest
+
+pytest.importorskip("cv2")
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+
+from mod.coarse_to_fine import CROP_SIZE, MAX_CROPS, MAX_TILES, _axis_starts, crop_windows
+
+FRAME_W, FRAME_H = 3840, 2160
+
+
+def assert_tiles_cover(starts, lo, hi, side, limit):
+    assert starts == sorted(starts)
+    assert all(0 <= s <= limit - side for s in starts)
+    # Starts are whole pixels, so coverage is exact up to the sub-pixel remainder
+    assert starts[0] <= lo + 1
+    assert starts[-1] + side >= hi - 1
+    for prev, cur in zip(starts, starts[1:]):
+        assert cur <= prev + side
+
+
+@pytest.mark.parametrize("lo, hi", [(0, 640.5), (100, 740.9), (0, 641), (1000, 1640.01), (893.25, 1533.75)])
+def test_axis_starts_just_over_one_tile(lo, hi):
+    # Used to truncate the extent to 640 and divide by zero
+    starts = _axis_starts(lo, hi, CROP_SIZE, FRAME_W)
+    assert 1 <= len(starts) <= 2
+    assert_tiles_cover(starts, lo, hi, CROP_SIZE, FRAME_W)
+
+
+@pytest.mark.parametrize("lo, hi", [(0, 700), (100, 1279.5), (3000, 3840)])
+def test_axis_starts_tiles_larger_extents(lo, hi):
+    starts = _axis_starts(lo, hi, CROP_SIZE, FRAME_W)
+    assert len(starts) == 2
+    assert_tiles_cover(starts, lo, hi, CROP_SIZE, FRAME_W)
+
+
+@pytest.mark.parametrize("lo, hi", [(0, 640), (100, 740), (200.25, 839.75), (10, 20)])
+def test_axis_starts_single_tile(lo, hi):
+    starts = _axis_starts(lo, hi, CROP_SIZE, FRAME_W)
+    assert len(starts) == 1
+    assert_tiles_cover(starts, lo, hi, CROP_SIZE, FRAME_W)
+
+
+def test_axis_starts_clamped_to_frame():
+    assert _axis_starts(3700, 3840, CROP_SIZE, FRAME_W) == [FRAME_W - CROP_SIZE]
+    assert _axis_starts(0, 30, CROP_SIZE, FRAME_W) == [0]
+    # Frame side smaller than a crop: the single tile is the whole axis
+    assert _axis_starts(50, 400, CROP_SIZE, 480) == [0]
+
+
+@pytest.mark.parametrize("extent", [639.9, 640, 640.001, 700, 1279.5, 1280, 1300, 2000.7, 3839.9])
+def test_axis_starts_tile_count(extent):
+    lo = (FRAME_W - extent) / 2
+    starts = _axis_starts(lo, lo + extent, CROP_SIZE, FRAME_W)
+    assert 1 <= len(starts) <= max(1, math.ceil(extent / CROP_SIZE))
+    assert_tiles_cover(starts, lo, lo + extent, CROP_SIZE, FRAME_W)
+
+
+def test_crop_windows_boundary_candidate():
+    # 427 px wide box: padded by CROP_PADDING it is just over one crop wide
+    candidates = torch.tensor([[1000.0, 800.0, 1427.0, 1000.0]])
+    windows = crop_windows(candidates, FRAME_W, FRAME_H, CROP_SIZE)
+    assert 1 <= len(windows) <= 2
+    for x0, y0, x1, y1 in windows:
+        assert (x1 - x0, y1 - y0) == (CROP_SIZE, CROP_SIZE)
+        assert 0 <= x0 and x1 <= FRAME_W and 0 <= y0 and y1 <= FRAME_H
+
+
+def test_crop_windows_tiles_wide_candidate():
+    candidates = torch.tensor([[1000.0, 800.0, 1600.0, 1000.0]])
+    windows = crop_windows(candidates, FRAME_W, FRAME_H, CROP_SIZE)
+    assert len(windows) == 2
+    assert windows[0][0] <= 850 and windows[-1][2] >= 1750
+
+
+def test_crop_windows_exact_size_and_in_frame():
+    candidates = torch.tensor([
+        [0.0, 0.0, 50.0, 50.0],
+        [3800.0, 2100.0, 3840.0, 2160.0],
+        [1900.0, 1000.0, 1950.0, 1100.0],
+    ])
+    windows = crop_windows(candidates, FRAME_W, FRAME_H, CROP_SIZE)
+    assert len(windows) == 3
+    for x0, y0, x1, y1 in windows:
+        assert (x1 - x0, y1 - y0) == (CROP_SIZE, CROP_SIZE)
+        assert 0 <= x0 and x1 <= FRAME_W and 0 <= y0 and y1 <= FRAME_H
+
+
+def test_crop_windows_skips_candidates_needing_too_many_tiles():
+    # Padded to about 1.5x the frame-wide box: far more than MAX_TILES tiles
+    candidates = torch.tensor([[100.0, 100.0, 3000.0, 2000.0]])
+    assert crop_windows(candidates, FRAME_W, FRAME_H, CROP_SIZE) == []
+
+
+def test_crop_windows_reuses_covering_window_and_caps_crops():
+    nested = torch.tensor([[1000.0, 1000.0, 1100.0, 1100.0], [1020.0, 1020.0, 1080.0, 1080.0]])
+    assert len(crop_windows(nested, FRAME_W, FRAME_H, CROP_SIZE)) == 1
+
+    spread = torch.tensor([[x, y, x + 40.0, y + 40.0]
+                           for x in range(0, FRAME_W - 40, 700) for y in range(0, FRAME_H - 40, 700)])
+    windows = crop_windows(spread, FRAME_W, FRAME_H, CROP_SIZE)
+    assert len(windows) == MAX_CROPS
+    assert MAX_TILES <= MAX_CROPS